@@ -1,14 +1,15 @@
 import tkinter as tk
 from tkinter import scrolledtext
-import json
+import orjson
 import time
-import datetime
 import airsim
 import cv2 
 import numpy as np
 from PIL import Image, ImageTk 
 import sys
 import os
+import queue
+import threading
 
 # --- Configuration ---
 LEDGER_FILE = 'epoh_ledger.json'
@@ -16,8 +17,48 @@ LEDGER_FILE = 'epoh_ledger.json'
 AIRSIM_HOST_IP = "10.163.164.35" 
 AIRSIM_PORT = 41451
 IMAGE_DISPLAY_SIZE = (640, 360) 
+# MJPEG camera stream published by UAV_Client.py; AirSim RPC polling is the fallback
+MJPEG_STREAM_URL = "http://127.0.0.1:8080/stream.mjpg"
+STREAM_RETRY_INTERVAL = 5.0 # seconds of RPC fallback before trying the stream again
+FRAME_BUFFERS = 3           # Preallocated RGB frames: one being written, one queued, one being pasted
+FRAME_POLL_INTERVAL = 0.1   # seconds between AirSim frame requests (image worker)
+LEDGER_POLL_INTERVAL = 0.2  # seconds between ledger stat() checks (ledger worker)
+UI_REFRESH_MS = 100         # how often Tk drains the worker queues
+MAX_LOG_LINES = 5000        # Oldest entries are dropped past this, keeping the Text widget fast
+LOG_HEADER_LINES = 3        # Lines written by initialize_log_header, never trimmed
 # ----------------------------------------------------
 
+# --- Log Formatters: each returns (tag, detail) for one kind of transaction ---
+
+def _format_auth(tx, data, block_index):
+    return "AUTH", f"AUTH OK | Key: {tx.get('session_key_sim', 'N/A')[:16]}..."
+
+def _format_genesis(tx, data, block_index):
+    return "INIT", "System Initialized"
+
+def _format_default(tx, data, block_index):
+    """Telemetry/path data, or the raw TX ID for anything unrecognized."""
+    # --- TELEMETRY/PATH DATA CHECK ---
+    if 'x_pos' in data and 'y_pos' in data:
+        x, y, z = data['x_pos'], data['y_pos'], data['z_alt']
+        vel = data['vel_mag']
+        
+        # Identify Takeoff/Landing heuristically 
+        event_tag = "PATH"
+        if data.get('status') == "LANDING_FINAL":
+             event_tag = "LANDING"
+        elif z < -0.5 and block_index == 3: 
+             event_tag = "TAKEOFF"
+        
+        return event_tag, f"({x:7.2f}, {y:7.2f}) | {z:6.2f}m     | {vel:5.2f} m/s   | N/A"
+    return "MISC", f"Raw TX ID: {tx.get('tx_id', 'N/A')}"
+
+# Keyed on tx['status'], falling back to tx['tx_id']
+_FORMATTERS = {
+    'AUTHENTICATED': _format_auth,
+    'GENESIS_TX': _format_genesis,
+}
+
 class GCSCombinedDashboard:
     def __init__(self, master):
         self.master = master
@@ -25,13 +66,30 @@ class GCSCombinedDashboard:
         self.last_chain_length = 0
         self.tk_img = None
         
-        # --- AirSim Client Setup ---
-        try:
-            self.airsim_client = airsim.MultirotorClient(ip=AIRSIM_HOST_IP, port=AIRSIM_PORT)
-            self.airsim_client.confirmConnection()
-        except Exception as e:
-            self.airsim_client = None
-            print(f"Live View Connection Error: Failed to connect to AirSim for status checks. Details: {e}") 
+        # Incremental ledger state: only bytes past _ledger_offset are ever read
+        self._ledger_stamp = None # (inode, mtime_ns, size) at the last successful read
+        self._ledger_offset = 0
+        self.last_block = None
+        self.is_authenticated = False
+        
+        # Frame fetching and ledger reads run on worker threads; Tk only drains these queues
+        self._frame_queue = queue.Queue(maxsize=1) # Newest frame only
+        self._ledger_queue = queue.Queue()         # Every batch of new blocks, in order
+        
+        # Display-size buffers the image worker resizes and converts into (no per-frame allocation)
+        frame_shape = (IMAGE_DISPLAY_SIZE[1], IMAGE_DISPLAY_SIZE[0], 3)
+        self._resized = np.empty(frame_shape, dtype=np.uint8)
+        # RGB buffers not currently queued or being pasted; the UI hands each one back when done
+        self._free_rgb = queue.Queue()
+        for _ in range(FRAME_BUFFERS):
+            self._free_rgb.put(np.empty(frame_shape, dtype=np.uint8))
+        
+        # Options each label was last configured with, so unchanged updates skip Tk entirely
+        self._label_options = {}
+        
+        # --- AirSim Client (fallback when the MJPEG stream is down) ---
+        # Connected lazily by the image worker, so an unreachable host never blocks the window
+        self.airsim_client = None
 
         # --- Top Frame for Image and Status ---
         top_frame = tk.Frame(master)
@@ -58,7 +116,9 @@ class GCSCombinedDashboard:
         self.log_area.pack(pady=10, padx=10, fill=tk.BOTH, expand=True)
         self.initialize_log_header()
 
-        # Start the update loop
+        # Start the workers and the update loop
+        threading.Thread(target=self.image_worker, daemon=True).start()
+        threading.Thread(target=self.ledger_worker, daemon=True).start()
         self.master.after(100, self.update_dashboard)
         
     def initialize_log_header(self):
@@ -71,138 +131,266 @@ class GCSCombinedDashboard:
         self.log_area.delete(1.0, tk.END)
         self.log_area.insert(tk.END, header)
 
+    def trim_log(self):
+        """Deletes the oldest entries (below the header) once the log exceeds MAX_LOG_LINES."""
+        excess = int(self.log_area.index('end-1c').split('.')[0]) - 1 - MAX_LOG_LINES
+        if excess > 0:
+            self.log_area.delete(f'{LOG_HEADER_LINES + 1}.0', f'{LOG_HEADER_LINES + 1 + excess}.0')
+
+    def set_label(self, label, **options):
+        """Configures label only if options differ from what it already shows."""
+        if self._label_options.get(label) != options:
+            label.config(**options)
+            self._label_options[label] = options
+
     def load_static_image(self):
         """Placeholder function to show what a failed stream looks like, keeping the UI running."""
         self.image_label.config(text="Live View: Image stream currently UNAVAILABLE.", fg="red")
         
+    def fetch_frame(self):
+        """
+        Fetches one camera frame from AirSim (runs on the image worker thread).
+        Returns (rgb_array, None) on success or (None, error_text) on failure.
+        """
+        try:
+            # 1. Request image data
+            responses = self.airsim_client.simGetImages([airsim.ImageRequest("0", airsim.ImageType.Scene, False, False)])
+            
+            if not responses:
+                return None, "Live View: No response from camera API."
+            
+            response = responses[0]
+            img_data = response.image_data_uint8
+            
+            # 2. CRITICAL CHECK: Ensure data is not empty before decoding
+            if not img_data or len(img_data) == 0:
+                # Log an error but do not crash the application
+                return None, "Live View: Image stream returned empty frame."
+
+            # 3. The request is uncompressed, so the payload is raw BGR pixels: no decode needed
+            np_arr = np.frombuffer(img_data, np.uint8)
+            
+            # 4. Final check before processing (fixes the OpenCV Assert error)
+            if np_arr.size != response.height * response.width * 3:
+                return None, "Live View: Decoding Failed (Invalid Data)."
+            img_bgr = np_arr.reshape(response.height, response.width, 3)
+
+            # 5. Process
+            return self.prepare_frame(img_bgr), None
+            
+        except Exception as e:
+            return None, f"Live View Exception: {e}"
+
+    def prepare_frame(self, img_bgr):
+        """Resizes a BGR frame for display and converts it to RGB, in preallocated buffers."""
+        # Only free buffers are written, so a frame the UI is still pasting is never overwritten
+        img_rgb = self._free_rgb.get()
+        try:
+            # Resize first so the colour conversion touches fewer pixels
+            cv2.resize(img_bgr, IMAGE_DISPLAY_SIZE, dst=self._resized, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=img_rgb)
+        except Exception:
+            self._free_rgb.put(img_rgb)
+            raise
+        return img_rgb
+
+    def publish_frame(self, frame):
+        """Queues (rgb_array, error_text) for the UI, replacing any frame not yet shown."""
+        try:
+            dropped_rgb, _ = self._frame_queue.get_nowait()
+            if dropped_rgb is not None:
+                self._free_rgb.put(dropped_rgb) # Never reached the UI, so it is free again
+        except queue.Empty:
+            pass
+        self._frame_queue.put(frame)
+
+    def read_stream(self):
+        """Publishes frames from the UAV's MJPEG stream until it ends or fails to open."""
+        # FFmpeg + libjpeg-turbo decode straight into a BGR array; no per-frame RPC
+        cap = cv2.VideoCapture(MJPEG_STREAM_URL)
+        try:
+            while cap.isOpened():
+                ok, img_bgr = cap.read() # Paced by the stream itself
+                if not ok:
+                    break
+                self.publish_frame((self.prepare_frame(img_bgr), None))
+        finally:
+            cap.release()
+
+    def connect_airsim(self):
+        """Connects the AirSim RPC fallback (image worker thread). Returns None if AirSim is unreachable."""
+        try:
+            client = airsim.MultirotorClient(ip=AIRSIM_HOST_IP, port=AIRSIM_PORT)
+            client.confirmConnection()
+            return client
+        except Exception as e:
+            print(f"Live View Connection Error: Failed to connect to AirSim. Details: {e}") 
+            return None
+
+    def image_worker(self):
+        """Feeds frames to the UI off the Tk thread, preferring the MJPEG stream over AirSim RPC."""
+        next_stream_attempt = 0.0
+        while True:
+            if time.time() >= next_stream_attempt:
+                try:
+                    self.read_stream()
+                except Exception as e:
+                    # e.g. cv2.error: report it and fall through to the RPC fallback
+                    self.publish_frame((None, f"Live View Stream Exception: {e}"))
+                next_stream_attempt = time.time() + STREAM_RETRY_INTERVAL
+                # The stream ended or never opened: only now is the RPC fallback worth connecting
+                if self.airsim_client is None:
+                    self.airsim_client = self.connect_airsim()
+            
+            if self.airsim_client:
+                self.publish_frame(self.fetch_frame())
+            else:
+                self.publish_frame((None, "Live View: Image stream currently UNAVAILABLE."))
+            time.sleep(FRAME_POLL_INTERVAL)
+
     def update_image(self):
-        """Fetches and updates the drone camera image, with robust error handling."""
-        if self.airsim_client:
-            try:
-                # 1. Request image data
-                responses = self.airsim_client.simGetImages([airsim.ImageRequest("0", airsim.ImageType.Scene, False, False)])
-                
-                if not responses:
-                    self.image_label.config(text="Live View: No response from camera API.", image=None)
-                    return False
-                
-                img_data = responses[0].image_data_uint8
-                
-                # 2. CRITICAL CHECK: Ensure data is not empty before decoding
-                if not img_data or len(img_data) == 0:
-                    # Log an error but do not crash the application
-                    self.image_label.config(text="Live View: Image stream returned empty frame.", image=None, fg="red")
-                    return False
-
-                # 3. Decode the image data 
-                np_arr = np.frombuffer(img_data, np.uint8)
-                img_bgr = cv2.imdecode(np_arr, cv2.IMREAD_COLOR) 
-                
-                # 4. Final check before processing (fixes the OpenCV Assert error)
-                if img_bgr is None or img_bgr.size == 0:
-                    self.image_label.config(text="Live View: Decoding Failed (Invalid Data).", image=None, fg="red")
-                    return False
-
-                # 5. Process and Display
-                img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-                img_pil = Image.fromarray(img_rgb)
-                
-                # Resize for display
-                img_pil = img_pil.resize(IMAGE_DISPLAY_SIZE, Image.LANCZOS)
-                
-                # Convert to PhotoImage for Tkinter
-                self.tk_img = ImageTk.PhotoImage(img_pil) 
-                
-                # Update the label
-                self.image_label.config(image=self.tk_img, text="Live View: Streaming...", fg="blue")
+        """Displays the newest frame fetched by the image worker, if any."""
+        try:
+            img_rgb, error = self._frame_queue.get_nowait()
+        except queue.Empty:
+            return False
+
+        if img_rgb is None:
+            self.set_label(self.image_label, text=error, image=None, fg="red")
+            return False
+
+        # Reuse one PhotoImage for the whole session; allocating one per frame leaks in Tk
+        try:
+            if self.tk_img is None:
+                self.tk_img = ImageTk.PhotoImage(Image.fromarray(img_rgb))
                 self.image_label.image = self.tk_img 
-                return True
-                
-            except Exception as e:
-                self.image_label.config(text=f"Live View Exception: {e}", image=None, fg="red")
-        return False
+            else:
+                self.tk_img.paste(Image.fromarray(img_rgb))
+        finally:
+            self._free_rgb.put(img_rgb) # Tk has copied (or failed on) the pixels; the worker may reuse the buffer
+        
+        # Update the label (only reconfigured when coming back from an error or on the first frame)
+        self.set_label(self.image_label, image=self.tk_img, text="Live View: Streaming...", fg="blue")
+        return True
     
     def format_log_entry(self, block_index, tx_time, tx, chain_length):
         """Formats a single transaction for display."""
-        dt_object = datetime.datetime.fromtimestamp(tx_time)
-        data = tx.get('data', {}) 
-        
-        tag = "TX"
-        detail_status = ""
-        
-        # --- Authentication/System Data Check ---
-        if tx.get('status') == "AUTHENTICATED":
-            tag = "AUTH"
-            detail_status = f"AUTH OK | Key: {tx.get('session_key_sim', 'N/A')[:16]}..."
-            
-        elif tx.get('tx_id') == "GENESIS_TX":
-            tag = "INIT"
-            detail_status = "System Initialized"
-
-        # --- TELEMETRY/PATH DATA CHECK ---
-        elif 'x_pos' in data and 'y_pos' in data:
-            x, y, z = data['x_pos'], data['y_pos'], data['z_alt']
-            vel = data['vel_mag']
-            
-            # Identify Takeoff/Landing heuristically 
-            event_tag = "PATH"
-            if data.get('status') == "LANDING_FINAL":
-                 event_tag = "LANDING"
-            elif z < -0.5 and block_index == 3: 
-                 event_tag = "TAKEOFF"
-            
-            tag = event_tag
-            
-            detail_status = (
-                f"({x:7.2f}, {y:7.2f}) | {z:6.2f}m     | {vel:5.2f} m/s   | N/A"
-            )
-        else:
-            tag = "MISC"
-            detail_status = f"Raw TX ID: {tx.get('tx_id', 'N/A')}"
+        # Integer fields of localtime() + milliseconds: no datetime object or strftime per line
+        lt = time.localtime(tx_time)
+        time_stamp = f"{lt.tm_hour:02d}:{lt.tm_min:02d}:{lt.tm_sec:02d}.{int(tx_time % 1 * 1000):03d}"
+        # One dict lookup picks the formatter; telemetry and unknown TXs share the default
+        formatter = _FORMATTERS.get(tx.get('status') or tx.get('tx_id'), _format_default)
+        tag, detail_status = formatter(tx, tx.get('data', {}), block_index)
             
         # Format the log line
         log_line = (
-            f"[{block_index:>2}] {dt_object.strftime('%H:%M:%S.%f')[:-3]} | "
+            f"[{block_index:>2}] {time_stamp} | "
             f"{tag:<9} | {detail_status}\n"
         )
         return log_line
 
-    def update_dashboard(self):
-        """Main update loop that refreshes data and image."""
+    def read_new_blocks(self):
+        """
+        Reads only the NDJSON bytes appended since _ledger_offset and parses them
+        (runs on the ledger worker thread). Returns None when the file is unchanged.
+        """
+        st = os.stat(LEDGER_FILE)
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self._ledger_stamp:
+            return None
         
-        # 1. Update Image (Best effort stream)
-        self.update_image()
+        # A new inode or a shrunken file means the Leader Node started a fresh ledger
+        if self._ledger_stamp and (stamp[0] != self._ledger_stamp[0] or stamp[2] < self._ledger_offset):
+            self._ledger_offset = 0
+            self._ledger_queue.put(None) # Tells the UI to clear its log
         
-        # 2. Update Data Log
-        try:
-            with open(LEDGER_FILE, 'r') as f:
-                chain = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.status_label.config(text="Status: Waiting for Chain...", fg="orange")
-            self.master.after(500, self.update_dashboard)
-            return
+        with open(LEDGER_FILE, 'rb') as f:
+            f.seek(self._ledger_offset)
+            data = f.read()
+        # Only complete lines are parsed; a block still being appended is picked up on the next poll
+        end = data.rfind(b'\n') + 1
+        new_blocks = [orjson.loads(line) for line in data[:end].splitlines()]
+        
+        self._ledger_stamp = stamp
+        self._ledger_offset += end
+        return new_blocks
+
+    def ledger_worker(self):
+        """Tails the ledger off the Tk thread and queues each batch of new blocks."""
+        while True:
+            try:
+                new_blocks = self.read_new_blocks()
+            except (FileNotFoundError, orjson.JSONDecodeError):
+                new_blocks = []
+            
+            if new_blocks is not None:
+                self._ledger_queue.put(new_blocks)
+            time.sleep(LEDGER_POLL_INTERVAL)
+
+    def update_log(self):
+        """Appends the blocks queued by the ledger worker and refreshes the status panel."""
+        updated = False
+        new_lines = [] # Everything drained this tick goes into the widget with one insert
+        while True:
+            try:
+                new_blocks = self._ledger_queue.get_nowait()
+            except queue.Empty:
+                break
+            updated = True
+            
+            if new_blocks is None:
+                # The Leader Node started a fresh ledger
+                self.last_chain_length = 0
+                self.last_block = None
+                self.is_authenticated = False
+                self.initialize_log_header()
+                new_lines = []
+                continue
+
+            if new_blocks:
+                # Append new blocks since the last update
+                # One pass per transaction: format it and, until the first AUTH is seen, check for it
+                chain_length = self.last_chain_length + len(new_blocks)
+                for block in new_blocks:
+                    for tx in block['transactions']:
+                        new_lines.append(self.format_log_entry(block['index'], block['timestamp'], tx, chain_length))
+                        if not self.is_authenticated and tx.get('status') == "AUTHENTICATED":
+                            self.is_authenticated = True # Monotonic: never re-evaluated once True
+                self.last_chain_length = chain_length
+                self.last_block = new_blocks[-1]
 
-        if len(chain) > self.last_chain_length:
-            # Append new blocks since the last update
-            for block in chain[self.last_chain_length:]:
-                for tx in block['transactions']:
-                    line = self.format_log_entry(block['index'], block['timestamp'], tx, len(chain))
-                    self.log_area.insert(tk.END, line)
+        if not updated:
+            return # Ledger unchanged: nothing to redraw
 
+        if new_lines:
+            self.log_area.insert(tk.END, ''.join(new_lines))
+            self.trim_log()
             self.log_area.see(tk.END)
-            self.last_chain_length = len(chain)
+
+        if self.last_block is None:
+            self.set_label(self.status_label, text="Status: Waiting for Chain...", fg="orange")
+            return
 
         # 3. Update status panel
-        last_block = chain[-1]
-        is_authenticated = any(tx.get('status') == "AUTHENTICATED" for block in chain for tx in block.get('transactions', []))
+        last_block = self.last_block
+        is_authenticated = self.is_authenticated
 
-        self.status_label.config(text=f"Status: {'✅ AUTHENTICATED (Log Live)' if is_authenticated else '⚠️ AWAITING AUTHENTICATION'}", 
-                                fg="green" if is_authenticated else "red")
+        self.set_label(self.status_label, text=f"Status: {'✅ AUTHENTICATED (Log Live)' if is_authenticated else '⚠️ AWAITING AUTHENTICATION'}", 
+                       fg="green" if is_authenticated else "red")
                                 
-        self.hash_label.config(text=f"Integrity Hash (Block {last_block['index']}): {last_block['current_hash']}")
+        self.set_label(self.hash_label, text=f"Integrity Hash (Block {last_block['index']}): {last_block['current_hash']}")
+
+    def update_dashboard(self):
+        """Main update loop: drains the worker queues, never blocking on AirSim or disk."""
+        
+        # 1. Update Image (Best effort stream)
+        self.update_image()
+        
+        # 2. Update Data Log and status panel (skipped entirely while the ledger is unchanged)
+        self.update_log()
 
         # Schedule the next update
-        self.master.after(500, self.update_dashboard)
+        self.master.after(UI_REFRESH_MS, self.update_dashboard)
 
 if __name__ == '__main__':
     # Add necessary imports just for safety
@@ -4,49 +4,113 @@
 import tkinter as tk
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import json
+import numpy as np
+import orjson
 import time
+import os
 
 LEDGER_FILE = 'epoh_ledger.json'
+IDLE_POLL_MS = 200        # Cheap stat() re-check while the ledger is unchanged
+REDRAW_INTERVAL_MS = 1000 # Minimum gap between full redraws / retries
+TELEMETRY_FILE = 'epoh_telemetry.bin'
+
+# Layout of the Leader Node's binary telemetry records (matches TELEMETRY_RECORD there)
+TELEMETRY_DTYPE = np.dtype([('index', '<i4'), ('x_pos', '<f4'), ('y_pos', '<f4'), ('z_alt', '<f4'), ('vel_mag', '<f4')])
+
+# Parsed ledger cache: only the blocks appended since the last read are parsed
+_cached_chain = []
+_cached_ino = None
+_cached_mtime = None
+_cached_size = None
+_ledger_offset = 0
+
+# Telemetry series as float32 arrays, extended only with the blocks parsed on each tick
+_TELEMETRY_FIELDS = ('x_pos', 'y_pos', 'z_alt', 'vel_mag', 'index')
+_telemetry = {field: np.empty(0, dtype=np.float32) for field in _TELEMETRY_FIELDS}
+_telemetry_offset = 0
+
+# AUTH_SUCCESS transaction, cached once found (authentication is monotonic)
+_auth_tx_cached = None
+
+def _parse_incremental(offset):
+    """Parses the NDJSON blocks appended after byte `offset`. Returns (blocks, new_offset)."""
+    with open(LEDGER_FILE, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    # Only complete lines are parsed; a block still being appended is picked up next tick
+    end = data.rfind(b'\n') + 1
+    return [orjson.loads(line) for line in data[:end].splitlines()], offset + end
+
+def _read_telemetry_records(offset):
+    """Reads the whole telemetry records appended after byte `offset`. Returns (records, new_offset)."""
+    with open(TELEMETRY_FILE, 'rb') as f:
+        f.seek(offset)
+        buf = f.read()
+    count = len(buf) // TELEMETRY_DTYPE.itemsize
+    return np.frombuffer(buf, dtype=TELEMETRY_DTYPE, count=count), offset + count * TELEMETRY_DTYPE.itemsize
 
 def update_dashboard(canvas, ax_path, ax_alt, status_label, hash_label):
     """Reads the ledger and updates all visualization elements."""
+    global _cached_chain, _cached_ino, _cached_mtime, _cached_size, _ledger_offset, _telemetry, _telemetry_offset, _auth_tx_cached
     try:
-        # Load the latest state of the immutable ledger
-        with open(LEDGER_FILE, 'r') as f:
-            chain = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        # Skip the parse (and the redraw) when the ledger hasn't changed
+        st = os.stat(LEDGER_FILE)
+        if st.st_mtime_ns == _cached_mtime and st.st_size == _cached_size:
+            root.after(IDLE_POLL_MS, lambda: update_dashboard(canvas, ax_path, ax_alt, status_label, hash_label))
+            return
+
+        # A new inode or a shrunken file means the Leader Node started a fresh ledger
+        if st.st_ino != _cached_ino or st.st_size < _ledger_offset:
+            _cached_chain, _ledger_offset = [], 0
+            _telemetry = {field: np.empty(0, dtype=np.float32) for field in _TELEMETRY_FIELDS}
+            _telemetry_offset = 0
+            _auth_tx_cached = None
+
+        # Load only the blocks appended to the immutable ledger since the last tick
+        new_blocks, _ledger_offset = _parse_incremental(_ledger_offset)
+        _cached_chain.extend(new_blocks)
+        _cached_ino, _cached_mtime, _cached_size = st.st_ino, st.st_mtime_ns, st.st_size
+        chain = _cached_chain
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        # Missing ledger, or a genuinely corrupt line (partial appends are never parsed)
+        chain = []
+
+    if not chain:
         # Handle case where the file hasn't been created yet or is corrupted
         status_label.config(text="Status: Waiting for Chain...", fg="orange")
         # Schedule the next check
-        root.after(1000, lambda: update_dashboard(canvas, ax_path, ax_alt, status_label, hash_label))
+        root.after(REDRAW_INTERVAL_MS, lambda: update_dashboard(canvas, ax_path, ax_alt, status_label, hash_label))
         return
 
-    # --- Data Filtering ---
-    telemetry_blocks = [b for b in chain if b.get('index', 0) >= 3]
-    
-    x_coords, y_coords, altitudes, speeds, indices = [], [], [], [], []
-    is_authenticated = False
-    
-    for block in telemetry_blocks:
-        # Check for the Authentication Success Block
-        if block.get('index') == 2:
-            is_authenticated = True
-        
-        for tx in block.get('transactions', []):
-            if tx.get('data'): # It's a telemetry transaction
-                data = tx['data']
-                x_coords.append(data['x_pos'])
-                y_coords.append(data['y_pos'])
-                altitudes.append(data['z_alt'])
-                speeds.append(data['vel_mag'])
-                indices.append(block['index'])
+    # --- Data Filtering (new blocks only; older telemetry is already cached) ---
+    if os.path.exists(TELEMETRY_FILE):
+        # Binary side-channel written by the Leader Node: contiguous columns, no per-TX dict lookups
+        records, _telemetry_offset = _read_telemetry_records(_telemetry_offset)
+        new_series = tuple(records[field] for field in _TELEMETRY_FIELDS)
+    else:
+        # Ledgers recorded without the side-channel: extract from the new blocks in one pass
+        telemetry_blocks = [b for b in new_blocks if b.get('index', 0) >= 3]
+        rows = [
+            (data['x_pos'], data['y_pos'], data['z_alt'], data['vel_mag'], block['index'])
+            for block in telemetry_blocks
+            for tx in block.get('transactions', ())
+            if (data := tx.get('data')) # It's a telemetry transaction
+        ]
+        new_series = tuple(np.array(column, dtype=np.float32) for column in zip(*rows))
+
+    for field, values in zip(_TELEMETRY_FIELDS, new_series):
+        if len(values):
+            _telemetry[field] = np.concatenate((_telemetry[field], values.astype(np.float32, copy=False)))
+    x_coords, y_coords, altitudes, speeds, indices = (_telemetry[field] for field in _TELEMETRY_FIELDS)
+
+    # Earlier blocks were already searched, so only the new ones need a look
+    if _auth_tx_cached is None:
+        _auth_tx_cached = next((tx for block in new_blocks for tx in block.get('transactions', ()) if tx.get('status') == 'AUTHENTICATED'), None)
 
     # --- Update Status Labels (Top Panel) ---
-    if is_authenticated:
-        # Extract the secure session key from the AUTH_SUCCESS block
-        auth_tx = [tx for block in chain for tx in block.get('transactions', []) if tx.get('status') == 'AUTHENTICATED']
-        key = auth_tx[0]['session_key_sim'] if auth_tx else 'N/A'
+    if _auth_tx_cached is not None:
+        # Show the secure session key from the AUTH_SUCCESS block
+        key = _auth_tx_cached.get('session_key_sim', 'N/A')
         status_label.config(text=f"Status: ✅ AUTHENTICATED (Session Key: {key[:8]}...)", fg="green")
     else:
         status_label.config(text="Status: ⚠️ AWAITING AUTHENTICATION", fg="red")
@@ -55,52 +119,32 @@ def update_dashboard(canvas, ax_path, ax_alt, status_label, hash_label):
     hash_label.config(text=f"Integrity Hash (Block {chain[-1]['index']}): {last_hash}", fg="blue")
 
 
-    # --- Update Plots ---
+    # --- Update Plots (the artists are created once below; only their data changes) ---
     
     # 1. Path Visualization (X-Y)
-    ax_path.clear()
-    if x_coords:
-        # Plot path with a smooth blue line for clarity
-        ax_path.plot(x_coords, y_coords, linestyle='-', color='blue', label='Flight Path') 
+    path_line.set_data(x_coords, y_coords)
+    if x_coords.size:
         # Highlight current position
-        ax_path.scatter(x_coords[-1], y_coords[-1], color='red', s=50, label=f'Current UAV Pos: ({x_coords[-1]:.1f}, {y_coords[-1]:.1f})')
-        
-        # Add lines to indicate the takeoff point (0,0)
-        ax_path.axhline(0, color='gray', linestyle='--', linewidth=0.5)
-        ax_path.axvline(0, color='gray', linestyle='--', linewidth=0.5)
-        
-    ax_path.set_title("UAV Flight Path (X vs Y)")
-    ax_path.set_xlabel("X Position (meters)")
-    ax_path.set_ylabel("Y Position (meters)")
-    ax_path.legend(loc='upper left')
-    ax_path.grid(True)
+        path_scatter.set_offsets([(x_coords[-1], y_coords[-1])])
+        path_legend.get_texts()[1].set_text(f'Current UAV Pos: ({x_coords[-1]:.1f}, {y_coords[-1]:.1f})')
+    else:
+        path_scatter.set_offsets(np.empty((0, 2)))
+    ax_path.relim()
+    ax_path.autoscale_view()
     
     # 2. Altitude and Velocity Chart
-    ax_alt.clear()
-    
-    if indices:
-        # Altitude plot (Primary Y-axis)
-        ax_alt.plot(indices, altitudes, label='Altitude (Z-Alt)', color='green')
-        ax_alt.set_title("Altitude and Velocity Over Time")
-        ax_alt.set_xlabel("Block Index (EPOH Timeline)")
-        ax_alt.set_ylabel("Altitude (m)", color='green')
-        ax_alt.tick_params(axis='y', labelcolor='green')
-
-        # Velocity plot (Secondary Y-axis)
-        ax_speed = ax_alt.twinx()
-        ax_speed.plot(indices, speeds, label='Velocity (m/s)', color='red')
-        ax_speed.set_ylabel("Velocity (m/s)", color='red')
-        ax_speed.tick_params(axis='y', labelcolor='red')
-    else:
-        ax_alt.set_title("Waiting for Telemetry Data...")
-
-    # Adjust layout to prevent labels from overlapping
-    fig.tight_layout() 
-
-    canvas.draw()
+    alt_line.set_data(indices, altitudes)
+    vel_line.set_data(indices, speeds)
+    for ax in (ax_alt, ax_speed):
+        ax.relim()
+        ax.autoscale_view()
+    ax_alt.set_title("Altitude and Velocity Over Time" if indices.size else "Waiting for Telemetry Data...")
+
+    # The axis limits follow the growing flight, so this is a full (but deferred) redraw
+    canvas.draw_idle()
     
-    # Schedule the next update in 1000ms (1 second)
-    root.after(1000, lambda: update_dashboard(canvas, ax_path, ax_alt, status_label, hash_label))
+    # Schedule the next update after the redraw cool-down (1 second)
+    root.after(REDRAW_INTERVAL_MS, lambda: update_dashboard(canvas, ax_path, ax_alt, status_label, hash_label))
 
 # --- Main Tkinter Setup ---
 root = tk.Tk()
@@ -121,6 +165,34 @@ fig = Figure(figsize=(10, 7), dpi=100)
 ax_path = fig.add_subplot(211) # 2 rows, 1 column, 1st plot
 ax_alt = fig.add_subplot(212) # 2 rows, 1 column, 2nd plot
 
+# 1. Path Visualization (X-Y)
+ax_path.set_title("UAV Flight Path (X vs Y)")
+ax_path.set_xlabel("X Position (meters)")
+ax_path.set_ylabel("Y Position (meters)")
+ax_path.grid(True)
+# Add lines to indicate the takeoff point (0,0)
+ax_path.axhline(0, color='gray', linestyle='--', linewidth=0.5)
+ax_path.axvline(0, color='gray', linestyle='--', linewidth=0.5)
+# Plot path with a smooth blue line for clarity, plus a marker for the current position
+path_line, = ax_path.plot([], [], linestyle='-', color='blue', label='Flight Path')
+path_scatter = ax_path.scatter([], [], color='red', s=50, label='Current UAV Pos: N/A')
+path_legend = ax_path.legend(loc='upper left')
+
+# 2. Altitude (primary Y-axis) and Velocity (secondary Y-axis) Chart
+ax_alt.set_title("Waiting for Telemetry Data...")
+ax_alt.set_xlabel("Block Index (EPOH Timeline)")
+ax_alt.set_ylabel("Altitude (m)", color='green')
+ax_alt.tick_params(axis='y', labelcolor='green')
+alt_line, = ax_alt.plot([], [], label='Altitude (Z-Alt)', color='green')
+
+ax_speed = ax_alt.twinx()
+ax_speed.set_ylabel("Velocity (m/s)", color='red')
+ax_speed.tick_params(axis='y', labelcolor='red')
+vel_line, = ax_speed.plot([], [], label='Velocity (m/s)', color='red')
+
+# Adjust layout to prevent labels from overlapping
+fig.tight_layout()
+
 # Matplotlib Canvas (Embeds the figure into the Tkinter window)
 canvas = FigureCanvasTkAgg(fig, master=root)
 canvas_widget = canvas.get_tk_widget()
@@ -1,16 +1,61 @@
 # GCS_LeaderNode.py - Runs the Leader Node, EPOH chain, and Authentication Server
 
 import socket
-import json
+import msgpack
+import orjson
 import time
 import hashlib
+import math
 import os
+import struct
+import traceback
+
+_sha256 = hashlib.sha256
+
+def iter_sha256(seed, n):
+    """Applies sha256 to the 32-byte digest `seed` n times and returns the final digest."""
+    h = seed
+    for _ in range(n):
+        h = _sha256(h).digest()
+    return h
+
+def _mk_miner(difficulty):
+    """Returns a function applying `difficulty` sha256 rounds, unrolled for the small common cases."""
+    if difficulty == 1:
+        return lambda h: _sha256(h).digest()
+    if difficulty == 2:
+        return lambda h: _sha256(_sha256(h).digest()).digest()
+    return lambda h: iter_sha256(h, difficulty)
 
 # --- Configuration ---
 HOST = '127.0.0.1' 
 PORT = 50001        
 NODE_ID = 'Leader_Node_1'
 LEDGER_FILE = 'epoh_ledger.json'
+TELEMETRY_FILE = 'epoh_telemetry.bin'
+
+# Binary telemetry side-channel for the dashboards: one little-endian
+# (block index, x, y, z, velocity magnitude) record per mined telemetry TX
+TELEMETRY_RECORD = struct.Struct('<iffff')
+TELEMETRY_FIELDS = ('x_pos', 'y_pos', 'z_alt', 'vel_mag') # All four must be numeric for a record
+TELEMETRY_DECIMALS = 3 # Millimetre precision is ample for the flight log and plots
+RECV_BUFFER_SIZE = 4096 # Also the largest accepted message
+
+# Every message on the UAV <-> GCS socket is framed as a 4-byte big-endian length + payload.
+# Payloads are msgpack maps, except the fixed-size binary telemetry packet.
+FRAME_HEADER = struct.Struct('>I')
+
+# Binary telemetry packet, accepted on a connection once it has authenticated.
+# It replaces a msgpack TELEMETRY_TX map: magic, x, y, z, velocity magnitude, flags.
+TELEMETRY_PACKET = struct.Struct('<4sddddB')
+TELEMETRY_MAGIC = b'TLM1'
+TELEMETRY_FLAG_LANDING = 0x01 # data['status'] = 'LANDING_FINAL'
+
+# Static responses, built once instead of per request
+UNKNOWN_UAV_RESPONSE = {'status': 'AUTH_FAILURE', 'reason': 'Unknown SUPI/UAV ID'}
+RES_MISMATCH_RESPONSE = {'status': 'AUTH_FAILURE', 'reason': 'RES* mismatch or no pending challenge'}
+INVALID_REQUEST_RESPONSE = {'status': 'ERROR', 'reason': 'Invalid Request Type'}
+UNAUTHENTICATED_TELEMETRY_RESPONSE = {'status': 'AUTH_FAILURE', 'reason': 'Telemetry packet before authentication'}
 
 # Simulated Pre-Registered Database (UAV ID: Long-Term Key)
 UAV_DB = {
@@ -18,6 +63,27 @@ UAV_DB = {
     'UAV_B2': 'K_LongTerm_B2'   # Example second UAV
 }
 
+def has_telemetry_fields(data):
+    """
+    True if data carries every TELEMETRY_FIELDS value as a finite number. orjson writes NaN and
+    inf to the ledger as null, which the dashboards cannot format.
+    """
+    return isinstance(data, dict) and all(
+        type(data.get(key)) in (int, float) and math.isfinite(data[key]) for key in TELEMETRY_FIELDS
+    )
+
+def is_valid_telemetry_data(data):
+    """
+    True if data holds the TELEMETRY_FIELDS numbers plus, optionally, a string 'status'.
+    msgpack can carry partial maps, bytes, nesting and other values the dashboards cannot
+    format, so anything else is rejected.
+    """
+    return (
+        has_telemetry_fields(data)
+        and set(data) <= {*TELEMETRY_FIELDS, 'status'}
+        and isinstance(data.get('status', ''), str)
+    )
+
 # --- Import necessary core functions (requires epoh_core.py) ---
 
 # We define these locally to ensure the script is self-contained for execution
@@ -36,16 +102,27 @@ def generate_auth_vector_simulated(uav_supi, long_term_key):
     AV = (RAND, AUTN, XRES*, KTx)
     """
     rand = int(time.time() * 1000) # Unique Random Challenge
+    rand_bytes = str(rand).encode('utf-8')
+    
+    # Every component starts with K, so hash it once and branch with copy()
+    key_hash = hashlib.sha256(long_term_key.encode('utf-8'))
     
     # AUTN = HASH(K | SUPI | RAND) -> Authentication Token
-    autn_data = (long_term_key + uav_supi + str(rand)).encode('utf-8')
-    autn = hashlib.sha256(autn_data).hexdigest()
+    autn_hash = key_hash.copy()
+    autn_hash.update(uav_supi.encode('utf-8'))
+    autn_hash.update(rand_bytes)
+    autn = autn_hash.hexdigest()
     
-    # XRES* (Expected Response) -> Used for final verification
-    xres_data = (long_term_key + str(rand) + 'Expected').encode('utf-8')
-    xres_star = hashlib.sha256(xres_data).hexdigest()[:10]
+    # KTx = HASH(K | RAND) -> Session Key (same value as calculate_session_key_simulated)
+    key_rand_hash = key_hash.copy()
+    key_rand_hash.update(rand_bytes)
+    ktx = key_rand_hash.hexdigest()[:16]
     
-    return rand, autn, xres_star, calculate_session_key_simulated(long_term_key, rand)
+    # XRES* = HASH(K | RAND | 'Expected') -> Used for final verification
+    key_rand_hash.update(b'Expected')
+    xres_star = key_rand_hash.hexdigest()[:10]
+    
+    return rand, autn, xres_star, ktx
 
 class EPOH_Core:
     """
@@ -53,24 +130,36 @@ class EPOH_Core:
     """
     def __init__(self, difficulty=2):
         self.difficulty = difficulty 
-        self.latest_hash = '0' * 64
+        self._mine_one = _mk_miner(difficulty) # Specialized once for this difficulty
+        self.latest_hash_bytes = bytes(32) # Raw 32-byte digest; hex only when written out
         self.sequence_count = 0
         self.chain = [] # Store chain here for access by create_block
 
+    @property
+    def latest_hash(self):
+        """Hex form of the current PoH state, as stored in the ledger."""
+        return self.latest_hash_bytes.hex()
+
+    @latest_hash.setter
+    def latest_hash(self, hex_hash):
+        try:
+            self.latest_hash_bytes = bytes.fromhex(hex_hash)
+        except ValueError:
+            # Non-hex seeds (e.g. the genesis previous_hash '0') seed the chain with their UTF-8 bytes
+            self.latest_hash_bytes = hex_hash.encode('utf-8')
+
     def generate_sequential_hash(self):
         """Generates the next hash in the sequence."""
-        data = self.latest_hash.encode('utf-8')
-        new_hash = hashlib.sha256(data).hexdigest()
-        self.latest_hash = new_hash
+        self.latest_hash_bytes = _sha256(self.latest_hash_bytes).digest()
         self.sequence_count += 1
-        return new_hash
+        return self.latest_hash
 
     def embed_transaction(self, data_payload):
         """Incorporates transaction data into the sequential hash to timestamp it."""
-        data_string = json.dumps(data_payload, sort_keys=True)
-        combined_data = (self.latest_hash + data_string).encode('utf-8')
+        data_bytes = orjson.dumps(data_payload, option=orjson.OPT_SORT_KEYS)
+        combined_data = self.latest_hash_bytes + data_bytes
         
-        self.latest_hash = hashlib.sha256(combined_data).hexdigest()
+        self.latest_hash_bytes = _sha256(combined_data).digest()
         self.sequence_count += 1
         
         return time.time(), self.latest_hash
@@ -82,29 +171,32 @@ class EPOH_Core:
         self.latest_hash = previous_hash
         self.sequence_count = 0
         
-        event_log = []
+        # The PoH timeline is kept column-wise: one list per field, not one dict per TX
+        event_times, event_hashes, event_tx_ids = [], [], []
         
         for tx in transactions:
-            # Generate intermediate hashes (simulating time delay)
-            for _ in range(self.difficulty):
-                self.generate_sequential_hash()
+            # Generate intermediate hashes (simulating time delay) on raw digests
+            self.latest_hash_bytes = self._mine_one(self.latest_hash_bytes)
+            self.sequence_count += self.difficulty
             
             # Embed the transaction data (The POH step)
             tx_time, tx_hash = self.embed_transaction(tx)
             
-            event_log.append({
-                'event_type': 'TRANSACTION_EMBEDDED',
-                'timestamp': tx_time,
-                'hash_at_event': tx_hash,
-                'tx_id': tx.get('tx_id')
-            })
+            event_times.append(tx_time)
+            event_hashes.append(tx_hash)
+            event_tx_ids.append(tx.get('tx_id'))
 
         # Finalize the Block
         final_block = {
             'index': current_chain_length + 1,
             'timestamp': time.time(),
             'previous_hash': previous_hash,
-            'event_log': event_log, # The verifiable PoH timeline
+            'event_log': { # The verifiable PoH timeline
+                'event_type': 'TRANSACTION_EMBEDDED',
+                'timestamp': event_times,
+                'hash_at_event': event_hashes,
+                'tx_id': event_tx_ids
+            },
             'transactions': transactions
         }
         
@@ -113,6 +205,20 @@ class EPOH_Core:
         return final_block
 
 
+def _write_ledger_file(path, data, truncate=False):
+    """
+    Writes so that the dashboards never observe a torn update: appends go out as a
+    single unbuffered write(), and a truncating write atomically replaces the file.
+    """
+    if truncate:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    else:
+        with open(path, 'ab', buffering=0) as f:
+            f.write(data)
+
 # ---------------------
 
 class LeaderNode:
@@ -126,24 +232,43 @@ class LeaderNode:
             self.create_genesis_block()
 
     def load_chain(self):
-        """Loads the chain from the JSON file if it exists."""
+        """Loads the chain from the NDJSON ledger (one block per line) if it exists."""
         try:
             if os.path.exists(LEDGER_FILE):
-                with open(LEDGER_FILE, 'r') as f:
-                    self.chain = json.load(f)
+                with open(LEDGER_FILE, 'rb') as f:
+                    self.chain = [orjson.loads(line) for line in f]
                 self.epoh.latest_hash = self.chain[-1]['current_hash']
                 print(f"Loaded chain with {len(self.chain)} blocks.")
             else:
                 self.chain = []
-        except (json.JSONDecodeError, IndexError):
+        except (orjson.JSONDecodeError, IndexError, KeyError, TypeError, AttributeError):
              print(f"Error loading {LEDGER_FILE}. Starting new chain.")
              self.chain = []
 
 
-    def save_chain(self):
-        """Saves the current chain state to the JSON file."""
-        with open(LEDGER_FILE, 'w') as f:
-            json.dump(self.chain, f, indent=4)
+    def save_block(self, block, truncate=False):
+        """
+        Appends a single block to the ledger as one NDJSON line, so each write is O(1).
+        The block is serialized before anything is written, and its telemetry records go out
+        first so they are on disk by the time a dashboard sees the new block.
+        """
+        line = orjson.dumps(block) + b'\n'
+        self.save_telemetry(block, truncate)
+        _write_ledger_file(LEDGER_FILE, line, truncate)
+
+    def save_telemetry(self, block, truncate=False):
+        """Appends the block's telemetry TXs to TELEMETRY_FILE as fixed-size binary records."""
+        records = []
+        for tx in block['transactions']:
+            data = tx.get('data')
+            # Only complete, numeric telemetry gets a record; anything else stays ledger-only
+            if not has_telemetry_fields(data):
+                continue
+            try:
+                records.append(TELEMETRY_RECORD.pack(block['index'], *(data[key] for key in TELEMETRY_FIELDS)))
+            except OverflowError:
+                continue # Outside float32 range
+        _write_ledger_file(TELEMETRY_FILE, b''.join(records), truncate)
 
     def create_genesis_block(self):
         """Creates the first block in the chain."""
@@ -151,15 +276,16 @@ class LeaderNode:
             'index': 0, 
             'timestamp': time.time(), 
             'previous_hash': '0',
-            'event_log': [{'event_type': 'CHAIN_START'}],
+            'event_log': {'event_type': 'CHAIN_START'},
             'transactions': [{'tx_id': 'GENESIS_TX', 'data': 'System Initialized'}]
         }
         # Use the EPOH core to finalize the genesis hash
         self.epoh.latest_hash = self.epoh.generate_sequential_hash()
         genesis_block['current_hash'] = self.epoh.latest_hash
         
+        # The genesis block always starts a fresh ledger (and telemetry) file
+        self.save_block(genesis_block, truncate=True)
         self.chain.append(genesis_block)
-        self.save_chain()
         print(f"Genesis Block Created. Hash: {genesis_block['current_hash'][:10]}...")
 
     def handle_uav_request(self, conn, request):
@@ -167,8 +293,11 @@ class LeaderNode:
         request_type = request.get('type')
         uav_supi = request.get('uav_supi')
         
+        # Fields arrive from the network: anything but a string SUPI is malformed
+        if not isinstance(uav_supi, str):
+            return INVALID_REQUEST_RESPONSE
         if uav_supi not in UAV_DB:
-            return {'status': 'AUTH_FAILURE', 'reason': 'Unknown SUPI/UAV ID'}
+            return UNKNOWN_UAV_RESPONSE
             
         long_term_key = UAV_DB[uav_supi]
 
@@ -223,28 +352,53 @@ class LeaderNode:
 
                 return {'status': 'AUTH_SUCCESS', 'session_key': session_key}
             else:
-                return {'status': 'AUTH_FAILURE', 'reason': 'RES* mismatch or no pending challenge'}
+                return RES_MISMATCH_RESPONSE
                 
         elif request_type == 'TELEMETRY_TX':
             # --- POST-AUTH: Handle Telemetry Transaction (TX) ---
             telemetry_data = request.get('data')
-            
-            # Add the transaction to the pool
-            self.transaction_pool.append({
-                'tx_id': f'TELEMETRY_{uav_supi}_{int(time.time())}',
-                'uav_supi': uav_supi,
-                'data': telemetry_data
-            })
-            
-            # Mine a block after a small batch of transactions
-            if len(self.transaction_pool) >= 3:
-                 self.mine_block()
-                 return {'status': 'TX_BLOCK_ACK', 'hash': self.chain[-1]['current_hash'][:10], 'next_hash': self.chain[-1]['current_hash']}
-            else:
-                 # Send back the current PoH hash seed
-                 return {'status': 'TX_RECEIVED', 'hash_seed': self.epoh.latest_hash[:10]}
+            if not is_valid_telemetry_data(telemetry_data):
+                return INVALID_REQUEST_RESPONSE
+            return self.record_telemetry(uav_supi, telemetry_data)
+
+        return INVALID_REQUEST_RESPONSE
 
-        return {'status': 'ERROR', 'reason': 'Invalid Request Type'}
+    def handle_telemetry_packet(self, uav_supi, packet):
+        """Handles a binary TELEMETRY_PACKET sent on a connection authenticated as uav_supi."""
+        if uav_supi is None:
+            return UNAUTHENTICATED_TELEMETRY_RESPONSE
+        
+        _, x_pos, y_pos, z_alt, vel_mag, flags = TELEMETRY_PACKET.unpack(packet)
+        telemetry_data = {'x_pos': x_pos, 'y_pos': y_pos, 'z_alt': z_alt, 'vel_mag': vel_mag}
+        if not has_telemetry_fields(telemetry_data):
+            return INVALID_REQUEST_RESPONSE
+        if flags & TELEMETRY_FLAG_LANDING:
+            telemetry_data['status'] = 'LANDING_FINAL'
+        return self.record_telemetry(uav_supi, telemetry_data)
+
+    def record_telemetry(self, uav_supi, telemetry_data):
+        """Adds a telemetry TX to the pool and mines a block once a small batch is ready."""
+        # Quantize floats so every ledger line (and dashboard parse) stays short
+        if isinstance(telemetry_data, dict):
+            telemetry_data = {
+                key: round(value, TELEMETRY_DECIMALS) if isinstance(value, float) else value
+                for key, value in telemetry_data.items()
+            }
+        
+        # Add the transaction to the pool
+        self.transaction_pool.append({
+            'tx_id': f'TELEMETRY_{uav_supi}_{int(time.time())}',
+            'uav_supi': uav_supi,
+            'data': telemetry_data
+        })
+        
+        # Mine a block after a small batch of transactions
+        if len(self.transaction_pool) >= 3:
+             self.mine_block()
+             return {'status': 'TX_BLOCK_ACK', 'hash': self.chain[-1]['current_hash'][:10], 'next_hash': self.chain[-1]['current_hash']}
+        else:
+             # Send back the current PoH hash seed
+             return {'status': 'TX_RECEIVED', 'hash_seed': self.epoh.latest_hash[:10]}
 
 
     def mine_block(self):
@@ -257,18 +411,36 @@ class LeaderNode:
         # Create the block using the EPOH process
         new_block = self.epoh.create_block(self.transaction_pool, last_hash, len(self.chain))
         
-        # Append and save
+        # Save, then append: the in-memory chain never gets ahead of the ledger on disk
+        self.save_block(new_block)
         self.chain.append(new_block)
-        self.save_chain()
         print(f"✅ EPOH Block #{new_block['index']} Mined. TX Count: {len(self.transaction_pool)}. Hash: {new_block['current_hash'][:10]}...")
         
         # Clear the pool only AFTER the block is successfully mined
         self.transaction_pool = []
         
 
+def recv_exact_into(conn, view, n):
+    """Fills view[:n] from the socket. Returns False if the peer closed the connection first."""
+    received = 0
+    while received < n:
+        chunk = conn.recv_into(view[received:n])
+        if not chunk:
+            return False
+        received += chunk
+    return True
+
+def send_frame(conn, payload):
+    """Sends one length-prefixed message."""
+    conn.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
 def start_leader_node():
     node = LeaderNode()
     
+    # A single receive buffer, reused for every message on every connection
+    buf = bytearray(RECV_BUFFER_SIZE)
+    view = memoryview(buf)
+    
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # Allows quick restart
         s.bind((HOST, PORT))
@@ -280,24 +452,45 @@ def start_leader_node():
                 conn, addr = s.accept()
                 with conn:
                     print(f"\nUAV Connected from {addr}")
+                    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # ACKs go out without Nagle delay
+                    session_supi = None # Set once this connection completes mutual authentication
                     while True:
-                        data = conn.recv(4096)
-                        if not data:
+                        # Read exactly one framed message: header first, then the payload
+                        if not recv_exact_into(conn, view, FRAME_HEADER.size):
+                            break
+                        (n,) = FRAME_HEADER.unpack_from(buf)
+                        if n > RECV_BUFFER_SIZE:
+                            print(f"Dropping connection: {n}-byte message exceeds {RECV_BUFFER_SIZE} bytes")
+                            break
+                        if not recv_exact_into(conn, view, n):
                             break
                         
-                        request = json.loads(data.decode('utf-8'))
-                        response = node.handle_uav_request(conn, request)
+                        # Steady-state telemetry arrives as a fixed-size binary packet, not msgpack
+                        if n == TELEMETRY_PACKET.size and view[:4] == TELEMETRY_MAGIC:
+                            response = node.handle_telemetry_packet(session_supi, view[:n])
+                        else:
+                            request = msgpack.unpackb(view[:n], raw=False)
+                            if not isinstance(request, dict):
+                                response = INVALID_REQUEST_RESPONSE
+                            else:
+                                response = node.handle_uav_request(conn, request)
+                                if response.get('status') == 'AUTH_SUCCESS':
+                                    session_supi = request.get('uav_supi')
                         
-                        conn.sendall(json.dumps(response).encode('utf-8'))
+                        send_frame(conn, msgpack.packb(response, use_bin_type=True))
             
+            except (OSError, ValueError, msgpack.UnpackException) as e:
+                # Abrupt disconnects and malformed messages end this connection only
+                print(f"Connection closed: {e}")
             except Exception as e:
-                # Often occurs when the client disconnects gracefully or abruptly
-                # print(f"Connection or processing error: {e}") 
-                pass
+                # Any other failure while handling a request also ends only this connection
+                print(f"Connection closed: unexpected {type(e).__name__} while handling a request: {e}")
+                traceback.print_exc()
 
 if __name__ == '__main__':
     # Before starting, clear the ledger for a fresh test
-    if os.path.exists(LEDGER_FILE):
-        os.remove(LEDGER_FILE)
+    for stale_file in (LEDGER_FILE, TELEMETRY_FILE):
+        if os.path.exists(stale_file):
+            os.remove(stale_file)
     
     start_leader_node()
\ No newline at end of file
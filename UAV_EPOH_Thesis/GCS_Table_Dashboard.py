@@ -9,12 +9,15 @@ AIRSIM_PORT = 41451 # Default AirSim RPC Port
 # GCS_Table_Dashboard.py - Simplified Text/Table Visualization for EPOH Thesis
 import tkinter as tk
 from tkinter import scrolledtext
-import json
+import orjson
 import time
-import datetime
 import os
 
 LEDGER_FILE = 'epoh_ledger.json'
+IDLE_POLL_MS = 200        # Cheap stat() re-check while the ledger is unchanged
+REDRAW_INTERVAL_MS = 1000 # Minimum gap between full updates / retries
+MAX_LOG_LINES = 5000      # Oldest entries are dropped past this, keeping the Text widget fast
+LOG_HEADER_LINES = 3      # Lines written by initialize_log_header, never trimmed
 
 class GCSDashboard:
     def __init__(self, master):
@@ -22,6 +25,14 @@ class GCSDashboard:
         master.title("EPOH UAV Data Log Dashboard")
         self.last_chain_length = 0
 
+        # Parsed ledger cache: only the blocks appended since the last read are parsed
+        self._cached_chain = []
+        self._cached_ino = None
+        self._cached_mtime = None
+        self._cached_size = None
+        self._ledger_offset = 0
+        self._is_authenticated = False # Monotonic: never re-evaluated once True
+
         # --- Status and Integrity Frame ---
         status_frame = tk.Frame(master)
         status_frame.pack(pady=10)
@@ -50,9 +61,17 @@ class GCSDashboard:
         self.log_area.delete(1.0, tk.END)
         self.log_area.insert(tk.END, header)
 
+    def trim_log(self):
+        """Deletes the oldest entries (below the header) once the log exceeds MAX_LOG_LINES."""
+        excess = int(self.log_area.index('end-1c').split('.')[0]) - 1 - MAX_LOG_LINES
+        if excess > 0:
+            self.log_area.delete(f'{LOG_HEADER_LINES + 1}.0', f'{LOG_HEADER_LINES + 1 + excess}.0')
+
     def format_log_entry(self, block_index, tx_time, tx, chain_length):
         """Formats a single transaction for display, prioritizing telemetry."""
-        dt_object = datetime.datetime.fromtimestamp(tx_time)
+        # Integer fields of localtime() + milliseconds: no datetime object or strftime per line
+        lt = time.localtime(tx_time)
+        time_stamp = f"{lt.tm_hour:02d}:{lt.tm_min:02d}:{lt.tm_sec:02d}.{int(tx_time % 1 * 1000):03d}"
         data = tx.get('data', {}) 
         
         tag = "TX"
@@ -92,32 +111,67 @@ class GCSDashboard:
             
         # Format the line for the ScrolledText widget
         log_line = (
-            f"[{block_index:>2}] {dt_object.strftime('%H:%M:%S.%f')[:-3]} | "
+            f"[{block_index:>2}] {time_stamp} | "
             f"{tag:<9} | {detail_status}\n"
         )
         return log_line
 
+    def _parse_incremental(self):
+        """Parses the NDJSON blocks appended since the last read and advances the offset."""
+        with open(LEDGER_FILE, 'rb') as f:
+            f.seek(self._ledger_offset)
+            data = f.read()
+        # Only complete lines are parsed; a block still being appended is picked up next tick
+        end = data.rfind(b'\n') + 1
+        new_blocks = [orjson.loads(line) for line in data[:end].splitlines()]
+        self._ledger_offset += end
+        return new_blocks
+
     def update_dashboard(self):
         """Reads the ledger and updates the text area."""
         try:
-            with open(LEDGER_FILE, 'r') as f:
-                chain = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+            # Nothing to do when the ledger hasn't changed since the last tick
+            st = os.stat(LEDGER_FILE)
+            if st.st_mtime_ns == self._cached_mtime and st.st_size == self._cached_size:
+                self.master.after(IDLE_POLL_MS, self.update_dashboard)
+                return
+
+            # A new inode or a shrunken file means the Leader Node started a fresh ledger
+            if st.st_ino != self._cached_ino or st.st_size < self._ledger_offset:
+                self._cached_chain, self._ledger_offset = [], 0
+                self.last_chain_length = 0
+                self._is_authenticated = False
+                self.initialize_log_header()
+
+            new_blocks = self._parse_incremental()
+            self._cached_chain.extend(new_blocks)
+            self._cached_ino, self._cached_mtime, self._cached_size = st.st_ino, st.st_mtime_ns, st.st_size
+            chain = self._cached_chain
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            # Missing ledger, or a genuinely corrupt line (partial appends are never parsed)
+            chain = []
+
+        if not chain:
             self.status_label.config(text="Status: Waiting for Chain...", fg="orange")
-            self.master.after(1000, self.update_dashboard)
+            self.master.after(REDRAW_INTERVAL_MS, self.update_dashboard)
             return
 
         # --- Only append new data if the chain has grown ---
         if len(chain) > self.last_chain_length:
             
             # --- Append new blocks since the last update ---
+            # Each line is formatted exactly once, when its block first appears,
+            # and all of them go into the widget with a single insert.
+            # (The current chain length is passed for heuristic checks like LANDING.)
+            # The same pass picks up the first AUTH transaction
+            new_lines = []
             for block in chain[self.last_chain_length:]:
-                
-                # Process each transaction in the new block
                 for tx in block['transactions']:
-                    # Pass the current length of the chain for heuristic checks (like LANDING)
-                    line = self.format_log_entry(block['index'], block['timestamp'], tx, len(chain))
-                    self.log_area.insert(tk.END, line)
+                    new_lines.append(self.format_log_entry(block['index'], block['timestamp'], tx, len(chain)))
+                    if not self._is_authenticated and tx.get('status') == "AUTHENTICATED":
+                        self._is_authenticated = True
+            self.log_area.insert(tk.END, ''.join(new_lines))
+            self.trim_log()
 
             # Scroll to the bottom and update last_chain_length
             self.log_area.see(tk.END)
@@ -125,7 +179,7 @@ class GCSDashboard:
 
         # --- Update status panel (Always update regardless of new block) ---
         last_block = chain[-1]
-        is_authenticated = any(tx.get('status') == "AUTHENTICATED" for block in chain for tx in block.get('transactions', []))
+        is_authenticated = self._is_authenticated
 
         self.status_label.config(text=f"Status: {'✅ AUTHENTICATED (Log Live)' if is_authenticated else '⚠️ AWAITING AUTHENTICATION'}", 
                                 fg="green" if is_authenticated else "red")
@@ -133,7 +187,7 @@ class GCSDashboard:
         self.hash_label.config(text=f"Integrity Hash (Block {last_block['index']}): {last_block['current_hash']}")
 
         # Schedule the next update
-        self.master.after(1000, self.update_dashboard)
+        self.master.after(REDRAW_INTERVAL_MS, self.update_dashboard)
 
 if __name__ == '__main__':
     # Ensure the environment can find tkinter before starting
@@ -1,9 +1,20 @@
 import airsim
+import asyncio
 import socket
-import json
+import msgpack
 import time 
 import hashlib
+import struct
 import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from math import hypot
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None # The MJPEG camera stream is optional; telemetry works without it
 
 
 UAV_SUPI = 'UAV_A1'           # Subscriber Identity (ID)
@@ -12,19 +23,64 @@ GCS_HOST = '127.0.0.1'
 GCS_PORT = 50001
 
 AIRSIM_HOST_IP = "10.163.164.35" 
+
+# Front camera published as MJPEG for the GCS dashboard: http://MJPEG_HOST:MJPEG_PORT/stream.mjpg
+# The stream is unauthenticated, so it is only served on loopback, like the GCS socket
+MJPEG_HOST = '127.0.0.1'
+MJPEG_PORT = 8080
+MJPEG_FRAME_INTERVAL = 0.1 # seconds between frames
+MJPEG_JPEG_QUALITY = 80
+
+# Binary telemetry packet (must match GCS_LeaderNode.py): magic, x, y, z, velocity magnitude, flags
+TELEMETRY_PACKET = struct.Struct('<4sddddB')
+TELEMETRY_MAGIC = b'TLM1'
+TELEMETRY_FLAG_LANDING = 0x01
+
+# Every message on the UAV <-> GCS socket is framed as a 4-byte big-endian length + payload.
+# Payloads are msgpack maps, except the fixed-size binary telemetry packet.
+FRAME_HEADER = struct.Struct('>I')
+RECV_BUFFER_SIZE = 4096 # Also the largest accepted message
+
+# Every telemetry frame starts with the same bytes (length header + magic), so they are built
+# once; only the values after them are packed per TX
+TELEMETRY_FRAME_PREFIX = FRAME_HEADER.pack(TELEMETRY_PACKET.size) + TELEMETRY_MAGIC
+_TELEMETRY_VALUES = struct.Struct('<ddddB') # TELEMETRY_PACKET minus the magic
+
+# A single receive buffer, reused for every GCS response
+_recv_buf = bytearray(RECV_BUFFER_SIZE)
+_recv_view = memoryview(_recv_buf)
 # ----------------------------------------------------
 
 # --- Core Cryptographic and Telemetry Functions ---
 
+# (K, RAND) -> (KTx, RES*); RAND is fixed for the whole session
+_auth_material_cache = {}
+
+# SHA-256 state after absorbing this UAV's long-term key, copied for each new RAND
+_K_BASE = hashlib.sha256(LONG_TERM_KEY.encode('utf-8'))
+_EXPECTED = b'Expected'
+
+def derive_auth_material_simulated(long_term_key, rand):
+    """Derives KTx = HASH(K | RAND) and RES* = HASH(K | RAND | 'Expected') in one pass."""
+    cache_key = (long_term_key, rand)
+    material = _auth_material_cache.get(cache_key)
+    if material is None:
+        # Both digests share the K | RAND prefix, so it is hashed only once
+        h = _K_BASE.copy() if long_term_key == LONG_TERM_KEY else hashlib.sha256(long_term_key.encode('utf-8'))
+        h.update(str(rand).encode('utf-8'))
+        h_res = h.copy()
+        h_res.update(_EXPECTED)
+        material = (h.hexdigest()[:16], h_res.hexdigest()[:10])
+        _auth_material_cache[cache_key] = material
+    return material
+
 def calculate_session_key_simulated(long_term_key, rand):
     """Simulates the derivation of the Session Key (KTx). KTx = HASH(K | RAND)"""
-    combined = (long_term_key + str(rand)).encode('utf-8')
-    return hashlib.sha256(combined).hexdigest()[:16]
+    return derive_auth_material_simulated(long_term_key, rand)[0]
 
 def calculate_res_star_simulated(long_term_key, rand):
     """Simulates the UAV calculating its response (RES*)."""
-    xres_data = (long_term_key + str(rand) + 'Expected').encode('utf-8')
-    return hashlib.sha256(xres_data).hexdigest()[:10]
+    return derive_auth_material_simulated(long_term_key, rand)[1]
 
 def get_telemetry_data(client):
     """Fetches key telemetry data from AirSim (position, altitude, velocity)."""
@@ -36,10 +92,192 @@ def get_telemetry_data(client):
         'x_pos': round(pos.x_val, 3),
         'y_pos': round(pos.y_val, 3),
         'z_alt': round(pos.z_val, 3), 
-        'vel_mag': round((vel.x_val**2 + vel.y_val**2 + vel.z_val**2)**0.5, 3)
+        'vel_mag': round(hypot(vel.x_val, vel.y_val, vel.z_val), 3)
     }
     return telemetry
 
+def pack_telemetry_frame(telemetry):
+    """Packs a telemetry dict into a complete frame holding the binary packet sent after authentication."""
+    flags = TELEMETRY_FLAG_LANDING if telemetry.get('status') == 'LANDING_FINAL' else 0
+    return TELEMETRY_FRAME_PREFIX + _TELEMETRY_VALUES.pack(
+        telemetry['x_pos'], telemetry['y_pos'], telemetry['z_alt'], telemetry['vel_mag'], flags
+    )
+
+def send_message(sock, payload):
+    """Sends one length-prefixed message to the GCS."""
+    sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+def recv_exact_into(sock, view, n):
+    """Fills view[:n] from the socket, however TCP happens to split the bytes."""
+    received = 0
+    while received < n:
+        chunk = sock.recv_into(view[received:n])
+        if not chunk:
+            raise ConnectionError("GCS closed the connection")
+        received += chunk
+
+def recv_message(sock):
+    """
+    Reads one length-prefixed message from the GCS into the shared receive buffer.
+    The returned memoryview is only valid until the next call.
+    """
+    recv_exact_into(sock, _recv_view, FRAME_HEADER.size)
+    (length,) = FRAME_HEADER.unpack_from(_recv_buf)
+    if length > RECV_BUFFER_SIZE:
+        raise ConnectionError(f"{length}-byte message exceeds {RECV_BUFFER_SIZE} bytes")
+    recv_exact_into(sock, _recv_view, length)
+    return _recv_view[:length]
+
+async def read_acks(reader, ack_stats):
+    """Drains GCS acknowledgements concurrently with sending, so telemetry never waits on the RTT."""
+    try:
+        while True:
+            (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+            response_tx = msgpack.unpackb(await reader.readexactly(length), raw=False)
+            ack_stats['acked'] += 1
+            
+            if response_tx.get('status') == 'TX_BLOCK_ACK':
+                ack_stats['blocks'] += 1
+                print(f"⬆️ TX ACK: Mined to Block! Hash: {response_tx['hash']}")
+            else:
+                print(f"-> TX Sent. Waiting for block...")
+    except asyncio.IncompleteReadError:
+        pass # GCS closed the connection
+
+async def fly_and_log(airsim_client, gcs_socket):
+    """Flies the logging path and lands, streaming telemetry over the authenticated socket."""
+    loop = asyncio.get_running_loop()
+    # The handshake ran on the blocking socket; asyncio takes it over from here
+    reader, writer = await asyncio.open_connection(sock=gcs_socket)
+    ack_stats = {'sent': 0, 'acked': 0, 'blocks': 0}
+    ack_task = asyncio.create_task(read_acks(reader, ack_stats))
+
+    def send_telemetry(telemetry):
+        # The connection is already authenticated, so only the numbers are sent
+        writer.write(pack_telemetry_frame(telemetry))
+        ack_stats['sent'] += 1
+
+    # --- 3. Telemetry Transmission (60-SECOND GUARANTEED FLIGHT) ---
+    print("\n--- Starting Authenticated Telemetry Logging (60 seconds) ---")
+    
+    # Define Path and Timing
+    PATH_SEGMENTS = [
+        (10, 0, -10),    # Hover 1: 10m East
+        (10, 10, -10),   # Corner 1: 10m East, 10m North
+        (0, 10, -10),    # Corner 2: 0m East, 10m North
+        (0, 0, -10)      # Hover 2: Back to start X/Y
+    ]
+    TOTAL_FLIGHT_TIME = 60 # seconds
+    LOG_INTERVAL = 2.0     # log every 2 seconds
+    
+    start_time = time.time()
+    path_index = 0
+    
+    while time.time() - start_time < TOTAL_FLIGHT_TIME:
+        
+        # Select next waypoint in the loop
+        wp_x, wp_y, wp_z = PATH_SEGMENTS[path_index % len(PATH_SEGMENTS)]
+        path_index += 1
+        
+        # Command the drone to move (the blocking AirSim RPC runs in a worker thread)
+        await loop.run_in_executor(
+            None, lambda: airsim_client.moveToPositionAsync(wp_x, wp_y, wp_z, 5, timeout_sec=1).join()
+        )
+        
+        # Log Data multiple times while moving/hovering
+        for i in range(2): 
+            if time.time() - start_time >= TOTAL_FLIGHT_TIME:
+                break
+            
+            telemetry_data = await loop.run_in_executor(None, get_telemetry_data, airsim_client)
+            send_telemetry(telemetry_data)
+            await writer.drain()
+            
+            # ACKs are handled by read_acks; the pace is set by LOG_INTERVAL alone
+            await asyncio.sleep(LOG_INTERVAL)
+
+    # --- 4. Cleanup and Landing ---
+    print("\nLanding UAV and terminating session...")
+    try:
+        # 🚨 FIX A: Explicit landing command
+        await loop.run_in_executor(None, lambda: airsim_client.landAsync().join()) # Wait for the landing task to finish
+
+        # 🚨 FIX B: Log a definitive "LANDING" transaction to the chain
+        final_telemetry = await loop.run_in_executor(None, get_telemetry_data, airsim_client)
+        final_telemetry['status'] = 'LANDING_FINAL' # Custom status for final log
+        
+        send_telemetry(final_telemetry)
+        await writer.drain()
+        
+        # Wait for GCS to process the final block
+        await asyncio.sleep(4) 
+        
+        def disarm_and_reset():
+            airsim_client.armDisarm(False)
+            airsim_client.reset()
+            airsim_client.enableApiControl(False)
+        await loop.run_in_executor(None, disarm_and_reset)
+        
+    except Exception as e:
+        print(f"Warning: Cleanup/Landing failed. Drone may remain in air. Details: {e}")
+
+    print(f"Telemetry: {ack_stats['sent']} sent, {ack_stats['acked']} acknowledged, {ack_stats['blocks']} mined to blocks.")
+    ack_task.cancel()
+    writer.close()
+    await writer.wait_closed()
+
+# --- Camera Stream ---
+
+class MjpegStreamHandler(BaseHTTPRequestHandler):
+    """Streams the front camera as multipart JPEG, one AirSim connection per viewer."""
+
+    def do_GET(self):
+        if self.path != '/stream.mjpg':
+            self.send_error(404)
+            return
+        
+        # msgpack-rpc clients are not thread-safe, so each viewer gets its own
+        camera_client = airsim.MultirotorClient(ip=AIRSIM_HOST_IP)
+        request = [airsim.ImageRequest("0", airsim.ImageType.Scene, False, False)]
+        encode_params = [cv2.IMWRITE_JPEG_QUALITY, MJPEG_JPEG_QUALITY]
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+        self.end_headers()
+        try:
+            while True:
+                response = camera_client.simGetImages(request)[0]
+                # Uncompressed request: the payload is raw BGR pixels
+                frame = np.frombuffer(response.image_data_uint8, np.uint8)
+                if frame.size == response.height * response.width * 3:
+                    ok, jpeg = cv2.imencode('.jpg', frame.reshape(response.height, response.width, 3), encode_params)
+                    if ok:
+                        self.wfile.write(
+                            b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n' % len(jpeg)
+                            + jpeg.tobytes() + b'\r\n'
+                        )
+                time.sleep(MJPEG_FRAME_INTERVAL)
+        except (BrokenPipeError, ConnectionResetError):
+            pass # Viewer disconnected
+
+    def log_message(self, format, *args):
+        pass # Keep per-request logs out of the flight output
+
+def start_mjpeg_server():
+    """Serves the camera stream on a background thread. Skipped if OpenCV is unavailable."""
+    if cv2 is None:
+        print("⚠️ OpenCV/numpy not installed: camera stream disabled.")
+        return None
+    try:
+        server = ThreadingHTTPServer((MJPEG_HOST, MJPEG_PORT), MjpegStreamHandler)
+    except OSError as e:
+        print(f"⚠️ Camera stream disabled: cannot listen on port {MJPEG_PORT}. Details: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📷 Camera stream at http://{MJPEG_HOST}:{MJPEG_PORT}/stream.mjpg")
+    return server
+
 # --- Main Client Logic ---
 
 def run_uav_client():
@@ -54,6 +292,7 @@ def run_uav_client():
         airsim_client = airsim.MultirotorClient(ip=AIRSIM_HOST_IP)
         airsim_client.confirmConnection()
         print("✅ AirSim API Connection Confirmed.")
+        start_mjpeg_server()
         
         print("Awaiting full PX4 link (3s delay)...")
         time.sleep(3) 
@@ -73,24 +312,24 @@ def run_uav_client():
     # --- 2. GCS Connection and Authentication ---
     try:
         gcs_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        gcs_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # Small frames go out immediately
         gcs_socket.connect((GCS_HOST, GCS_PORT))
         print(f"✅ Connected to GCS Leader Node at {GCS_HOST}:{GCS_PORT}")
         
         # Authentication Logic (Simplified: Handshake occurs here)
         auth_request_1 = { 'type': 'AUTH_REQUEST_1', 'uav_supi': UAV_SUPI }
-        gcs_socket.sendall(json.dumps(auth_request_1).encode('utf-8'))
-        response_1 = json.loads(gcs_socket.recv(4096).decode('utf-8'))
+        send_message(gcs_socket, msgpack.packb(auth_request_1, use_bin_type=True))
+        response_1 = msgpack.unpackb(recv_message(gcs_socket), raw=False)
         
         if response_1.get('status') == 'CHALLENGE_ISSUED':
             rand = response_1['rand']
-            calculated_ktx = calculate_session_key_simulated(LONG_TERM_KEY, rand)
-            calculated_res_star = calculate_res_star_simulated(LONG_TERM_KEY, rand)
+            calculated_ktx, calculated_res_star = derive_auth_material_simulated(LONG_TERM_KEY, rand)
 
             auth_response_2 = {
                 'type': 'AUTH_RESPONSE_2', 'uav_supi': UAV_SUPI, 'res_star': calculated_res_star 
             }
-            gcs_socket.sendall(json.dumps(auth_response_2).encode('utf-8'))
-            response_2 = json.loads(gcs_socket.recv(4096).decode('utf-8'))
+            send_message(gcs_socket, msgpack.packb(auth_response_2, use_bin_type=True))
+            response_2 = msgpack.unpackb(recv_message(gcs_socket), raw=False)
             
             if response_2.get('status') == 'AUTH_SUCCESS':
                 session_key = response_2['session_key']
@@ -102,83 +341,9 @@ def run_uav_client():
         print(f"❌ GCS Connection/Authentication Error: {e}")
     
     
-    # --- 3. Telemetry Transmission (60-SECOND GUARANTEED FLIGHT) ---
-    if session_key:
-        print("\n--- Starting Authenticated Telemetry Logging (60 seconds) ---")
-        
-        # Define Path and Timing
-        PATH_SEGMENTS = [
-            (10, 0, -10),    # Hover 1: 10m East
-            (10, 10, -10),   # Corner 1: 10m East, 10m North
-            (0, 10, -10),    # Corner 2: 0m East, 10m North
-            (0, 0, -10)      # Hover 2: Back to start X/Y
-        ]
-        TOTAL_FLIGHT_TIME = 60 # seconds
-        LOG_INTERVAL = 2.0     # log every 2 seconds
-        
-        start_time = time.time()
-        path_index = 0
-        
-        while time.time() - start_time < TOTAL_FLIGHT_TIME:
-            
-            # Select next waypoint in the loop
-            wp_x, wp_y, wp_z = PATH_SEGMENTS[path_index % len(PATH_SEGMENTS)]
-            path_index += 1
-            
-            # Command the drone to move (non-blocking call)
-            airsim_client.moveToPositionAsync(wp_x, wp_y, wp_z, 5, timeout_sec=1).join()
-            
-            # Log Data multiple times while moving/hovering
-            for i in range(2): 
-                if time.time() - start_time >= TOTAL_FLIGHT_TIME:
-                    break
-                
-                telemetry_data = get_telemetry_data(airsim_client)
-                
-                telemetry_tx = {
-                    'type': 'TELEMETRY_TX', 'uav_supi': UAV_SUPI,
-                    'session_key': session_key, 'data': telemetry_data
-                }
-                
-                gcs_socket.sendall(json.dumps(telemetry_tx).encode('utf-8'))
-                
-                # Receive GCS acknowledgement
-                response_tx = json.loads(gcs_socket.recv(4096).decode('utf-8'))
-                
-                if response_tx.get('status') == 'TX_BLOCK_ACK':
-                    print(f"⬆️ TX ACK: Mined to Block! Hash: {response_tx['hash']}")
-                else:
-                    print(f"-> TX Sent. Waiting for block...")
-                
-                time.sleep(LOG_INTERVAL)
-
-    # --- 4. Cleanup and Landing ---
+    # --- 3. Telemetry Transmission and 4. Landing (pipelined over asyncio) ---
     if airsim_client and session_key:
-        print("\nLanding UAV and terminating session...")
-        try:
-            # 🚨 FIX A: Explicit landing command
-            landing_task = airsim_client.landAsync()
-            landing_task.join()  # Wait for the landing task to finish
-
-            # 🚨 FIX B: Log a definitive "LANDING" transaction to the chain
-            final_telemetry = get_telemetry_data(airsim_client)
-            final_telemetry['status'] = 'LANDING_FINAL' # Custom status for final log
-            
-            final_tx = {
-                'type': 'TELEMETRY_TX', 'uav_supi': UAV_SUPI,
-                'session_key': session_key, 'data': final_telemetry
-            }
-            gcs_socket.sendall(json.dumps(final_tx).encode('utf-8'))
-            
-            # Wait for GCS to process the final block
-            time.sleep(4) 
-            
-            airsim_client.armDisarm(False)
-            airsim_client.reset()
-            airsim_client.enableApiControl(False)
-            
-        except Exception as e:
-            print(f"Warning: Cleanup/Landing failed. Drone may remain in air. Details: {e}")
+        asyncio.run(fly_and_log(airsim_client, gcs_socket))
             
     if gcs_socket:
         gcs_socket.close()
@@ -1,7 +1,24 @@
 import hashlib
-import json
+import orjson
 import time
 
+_sha256 = hashlib.sha256
+
+def iter_sha256(seed, n):
+    """Applies sha256 to the 32-byte digest `seed` n times and returns the final digest."""
+    h = seed
+    for _ in range(n):
+        h = _sha256(h).digest()
+    return h
+
+def _mk_miner(difficulty):
+    """Returns a function applying `difficulty` sha256 rounds, unrolled for the small common cases."""
+    if difficulty == 1:
+        return lambda h: _sha256(h).digest()
+    if difficulty == 2:
+        return lambda h: _sha256(_sha256(h).digest()).digest()
+    return lambda h: iter_sha256(h, difficulty)
+
 # --- Configuration (Can be adapted later for election simulation) ---
 UAV_IDENTIFIER = 'UAV_A1'
 NODE_ID = 'Leader_Node_1'
@@ -16,28 +33,40 @@ class EPOH_Core:
     def __init__(self, difficulty=5):
         # Difficulty represents the number of sequential hash iterations between blocks
         self.difficulty = difficulty 
-        self.latest_hash = '0' * 64 # Initial hash sequence seed
+        self._mine_one = _mk_miner(difficulty) # Specialized once for this difficulty
+        self.latest_hash_bytes = bytes(32) # Initial hash sequence seed (raw 32-byte digest)
         self.sequence_count = 0
 
+    @property
+    def latest_hash(self):
+        """Hex form of the current PoH state, as stored in the ledger."""
+        return self.latest_hash_bytes.hex()
+
+    @latest_hash.setter
+    def latest_hash(self, hex_hash):
+        try:
+            self.latest_hash_bytes = bytes.fromhex(hex_hash)
+        except ValueError:
+            # Non-hex seeds (e.g. the genesis previous_hash '0') seed the chain with their UTF-8 bytes
+            self.latest_hash_bytes = hex_hash.encode('utf-8')
+
     def generate_sequential_hash(self):
         """Generates the next hash in the sequence."""
-        data = self.latest_hash.encode('utf-8')
-        new_hash = hashlib.sha256(data).hexdigest()
-        self.latest_hash = new_hash
+        self.latest_hash_bytes = _sha256(self.latest_hash_bytes).digest()
         self.sequence_count += 1
-        return new_hash
+        return self.latest_hash
 
     def embed_transaction(self, data_payload):
         """
         Incorporates transaction data into the sequential hash to timestamp it.
         This simulates the PoH Generator receiving a transaction and embedding it.
         """
-        # Ensure the data is deterministic for consistent hashing
-        data_string = json.dumps(data_payload, sort_keys=True)
-        combined_data = (self.latest_hash + data_string).encode('utf-8')
+        # Ensure the data is deterministic for consistent hashing (sorted keys, compact bytes)
+        data_bytes = orjson.dumps(data_payload, option=orjson.OPT_SORT_KEYS)
+        combined_data = self.latest_hash_bytes + data_bytes
         
         # Hash the combined data
-        self.latest_hash = hashlib.sha256(combined_data).hexdigest()
+        self.latest_hash_bytes = _sha256(combined_data).digest()
         self.sequence_count += 1
         
         # Return the time and hash at which the event was recorded
@@ -53,29 +82,32 @@ class EPOH_Core:
         self.latest_hash = previous_hash
         self.sequence_count = 0
         
-        event_log = []
+        # The PoH timeline is kept column-wise: one list per field, not one dict per TX
+        event_times, event_hashes, event_tx_ids = [], [], []
         
         for tx in transactions:
-            # Generate intermediate hashes (simulating time delay)
-            for _ in range(self.difficulty):
-                self.generate_sequential_hash()
+            # Generate intermediate hashes (simulating time delay) on raw digests
+            self.latest_hash_bytes = self._mine_one(self.latest_hash_bytes)
+            self.sequence_count += self.difficulty
             
             # 2. Embed the transaction data (The EPOH step)
             tx_time, tx_hash = self.embed_transaction(tx)
             
-            event_log.append({
-                'event_type': 'TRANSACTION_EMBEDDED',
-                'timestamp': tx_time,
-                'hash_at_event': tx_hash,
-                'tx_id': tx.get('tx_id')
-            })
+            event_times.append(tx_time)
+            event_hashes.append(tx_hash)
+            event_tx_ids.append(tx.get('tx_id'))
 
         # 3. Finalize the Block
         final_block = {
             'index': len(self.chain) + 1 if hasattr(self, 'chain') else 1,
             'timestamp': time.time(),
             'previous_hash': previous_hash,
-            'event_log': event_log, # The verifiable PoH timeline
+            'event_log': { # The verifiable PoH timeline
+                'event_type': 'TRANSACTION_EMBEDDED',
+                'timestamp': event_times,
+                'hash_at_event': event_hashes,
+                'tx_id': event_tx_ids
+            },
             'transactions': transactions
         }
         
@@ -106,12 +138,24 @@ def generate_auth_vector_simulated(uav_supi, long_term_key):
     AV = (RAND, AUTN, XRES*)
     """
     rand = int(time.time() * 1000) # Unique Random Challenge
+    rand_bytes = str(rand).encode('utf-8')
+    
+    # Every component starts with K, so hash it once and branch with copy()
+    key_hash = hashlib.sha256(long_term_key.encode('utf-8'))
+    
     # AUTN = HASH(K | SUPI | RAND) -> Authentication Token
-    autn_data = (long_term_key + uav_supi + str(rand)).encode('utf-8')
-    autn = hashlib.sha256(autn_data).hexdigest()
+    autn_hash = key_hash.copy()
+    autn_hash.update(uav_supi.encode('utf-8'))
+    autn_hash.update(rand_bytes)
+    autn = autn_hash.hexdigest()
+    
+    # KTx = HASH(K | RAND) -> Session Key (same value as calculate_session_key_simulated)
+    key_rand_hash = key_hash.copy()
+    key_rand_hash.update(rand_bytes)
+    ktx = key_rand_hash.hexdigest()[:16]
     
-    # XRES* (Expected Response) -> Used for final verification
-    xres_data = (long_term_key + str(rand) + 'Expected').encode('utf-8')
-    xres_star = hashlib.sha256(xres_data).hexdigest()[:10]
+    # XRES* = HASH(K | RAND | 'Expected') -> Used for final verification
+    key_rand_hash.update(b'Expected')
+    xres_star = key_rand_hash.hexdigest()[:10]
     
-    return rand, autn, xres_star, calculate_session_key_simulated(long_term_key, rand)
\ No newline at end of file
+    return rand, autn, xres_star, ktx
\ No newline at end of file
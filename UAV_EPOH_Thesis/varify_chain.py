@@ -3,16 +3,62 @@ import hashlib
 import sys
 import os
 
+try:
+    import orjson
+
+    def canonical_json(obj):
+        """Serializes obj to compact JSON bytes with sorted keys."""
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+
+    load_json = orjson.loads
+except ImportError:
+    # Same bytes as orjson: compact separators, sorted keys, raw UTF-8
+    def canonical_json(obj):
+        """Serializes obj to compact JSON bytes with sorted keys."""
+        return json.dumps(obj, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()
+
+    load_json = json.loads
+
+# Parsed chains keyed by path, stored with the (mtime_ns, size) they were read at
+_chain_cache = {}
+
+def _load_chain_cached(path):
+    """Returns the parsed chain at path, re-parsing only if the file has changed."""
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _chain_cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    # The ledger is NDJSON: one block per line
+    with open(path, 'rb') as f:
+        chain = [load_json(line) for line in f]
+    _chain_cache[path] = (stamp, chain)
+    return chain
+
 def hash_block(block):
     """Calculates the SHA-256 hash of a block by ensuring deterministic JSON output."""
-    # Temporarily remove the 'current_hash' field before hashing, if it exists
-    temp_block = block.copy()
-    if 'current_hash' in temp_block:
-        del temp_block['current_hash'] 
-        
-    # JSON dump must be sorted for the hash to be consistent (deterministic)
-    block_string = json.dumps(temp_block, sort_keys=True).encode()
-    return hashlib.sha256(block_string).hexdigest()
+    # Feeds the hasher the same bytes as canonical_json(block minus 'current_hash'),
+    # one field (and one transaction) at a time, so a large block is never
+    # materialized as a single JSON buffer
+    h = hashlib.sha256()
+    sep = b'{'
+    for key in sorted(block):
+        if key == 'current_hash':
+            continue
+        h.update(sep + canonical_json(key) + b':')
+        sep = b','
+        value = block[key]
+        if type(value) is list:
+            item_sep = b'['
+            for item in value:
+                h.update(item_sep + canonical_json(item))
+                item_sep = b','
+            h.update(b']' if value else b'[]')
+        else:
+            h.update(canonical_json(value))
+    h.update(b'}' if sep == b',' else b'{}')
+    return h.hexdigest()
 
 def is_valid_chain():
     """
@@ -21,9 +67,8 @@ def is_valid_chain():
     print(f"\n--- Verifying EPOH Ledger: {os.path.abspath('epoh_ledger.json')} ---")
     
     try:
-        with open('epoh_ledger.json', 'r') as f:
-            chain = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        chain = _load_chain_cached('epoh_ledger.json')
+    except (FileNotFoundError, ValueError):
         return False, "Ledger file missing or corrupted (JSON Syntax Error)."
 
     if not chain:
@@ -34,13 +79,14 @@ def is_valid_chain():
         return False, "Genesis Block (Index 0) has an invalid previous_hash."
     
     # 2. Iterate through the rest of the chain (starting from Index 1)
+    # The previous block's hash is carried forward so each block is hashed once
+    previous_block = chain[0]
+    recalculated_hash = hash_block(previous_block)
     for i in range(1, len(chain)):
         current_block = chain[i]
-        previous_block = chain[i-1]
         
         # --- A. Integrity Check (The Core Proof of Immutability) ---
-        # Recalculate the hash of the PREVIOUS block as stored in the ledger
-        recalculated_hash = hash_block(previous_block)
+        # recalculated_hash is the hash of the PREVIOUS block as stored in the ledger
         
         # Compare the recalculated hash to the CURRENT block's 'previous_hash' field
         if current_block['previous_hash'] != recalculated_hash:
@@ -53,6 +99,9 @@ def is_valid_chain():
         # Ensure the timestamp is strictly increasing (proving sequential history)
         if current_block['timestamp'] <= previous_block['timestamp']:
              return False, f"PoH Chronology Failure: Block #{i} timestamp is not strictly greater than block #{i-1}."
+
+        previous_block = current_block
+        recalculated_hash = hash_block(current_block)
     
     return True, "Chain is fully valid."
 